@@ -0,0 +1,272 @@
+import argparse
+import json
+import math
+import threading
+import time
+from collections import deque
+
+from schema import LIGHTPOST_VALIDATORS
+
+# Streaming fleet aggregates over d2mesh/<gateway>/lightpost/<tag>/act_value.
+#
+# For every gateway and window the aggregator keeps the latest ActPower and DeviceMode per device,
+# plus min/max Voltage over all samples, and publishes one summary per window to
+# d2mesh/<gateway>/summary/<label> instead of consumers reading every act_value message.
+#
+# Sliding windows are built from panes of `slide` seconds: each pane is updated incrementally as
+# messages arrive and a window is the merge of its last window/slide panes. A tumbling window is
+# the special case slide == window, with a single pane and no merge.
+
+AGGREGATED_FIELDS = ("ActPower", "Voltage", "DeviceMode")
+
+
+class Pane:
+    __slots__ = ("devices", "act_power", "modes", "voltage_min", "voltage_max", "messages")
+
+    def __init__(self):
+        self.devices = {}  # tag -> (ActPower, DeviceMode), latest values in this pane
+        self.act_power = 0
+        self.modes = {}
+        self.voltage_min = None
+        self.voltage_max = None
+        self.messages = 0
+
+    def add(self, tag, values):
+        self.messages += 1
+
+        voltage = values.get("Voltage")
+        if voltage is not None:
+            self.voltage_min = voltage if self.voltage_min is None else min(self.voltage_min, voltage)
+            self.voltage_max = voltage if self.voltage_max is None else max(self.voltage_max, voltage)
+
+        # Messages may carry only some fields, keep the device's previous values for the rest
+        old_power, old_mode = self.devices.get(tag, (None, None))
+        power = values.get("ActPower", old_power)
+        mode = values.get("DeviceMode", old_mode)
+        self.devices[tag] = (power, mode)
+
+        # Running totals are adjusted by the difference, so each message is O(1)
+        self.act_power += (power or 0) - (old_power or 0)
+        if mode != old_mode:
+            if old_mode is not None:
+                self.modes[old_mode] -= 1
+                if not self.modes[old_mode]:
+                    del self.modes[old_mode]
+            if mode is not None:
+                self.modes[mode] = self.modes.get(mode, 0) + 1
+
+
+# Merge the panes of one window; later panes win for per-device values, field by field,
+# so a newer pane that never saw a field keeps the device's older value for it
+def merge_panes(panes):
+    if len(panes) == 1:
+        pane = panes[0]
+        return len(pane.devices), pane.act_power, dict(pane.modes), pane.voltage_min, pane.voltage_max, pane.messages
+
+    devices = {}
+    for pane in panes:
+        for tag, (power, mode) in pane.devices.items():
+            old = devices.get(tag)
+            if old is not None:
+                power = old[0] if power is None else power
+                mode = old[1] if mode is None else mode
+            devices[tag] = (power, mode)
+
+    act_power = 0
+    modes = {}
+    for power, mode in devices.values():
+        act_power += power or 0
+        if mode is not None:
+            modes[mode] = modes.get(mode, 0) + 1
+
+    minimums = [pane.voltage_min for pane in panes if pane.voltage_min is not None]
+    maximums = [pane.voltage_max for pane in panes if pane.voltage_max is not None]
+    return (
+        len(devices),
+        act_power,
+        modes,
+        min(minimums) if minimums else None,
+        max(maximums) if maximums else None,
+        sum(pane.messages for pane in panes),
+    )
+
+
+class WindowAggregator:
+    """Per-gateway aggregates over a tumbling (slide == window) or sliding window, in seconds."""
+
+    def __init__(self, window, slide=None):
+        self.window = window
+        self.slide = slide or window
+        # Compare the ratio with a tolerance, float modulo rejects windows like 0.3:0.1
+        ratio = self.window / self.slide
+        if not math.isclose(ratio, round(ratio)):
+            raise ValueError("window must be a multiple of slide")
+        self.pane_count = round(ratio)
+        self.label = f"{self.window:g}s" if self.slide == self.window else f"{self.window:g}s_{self.slide:g}s"
+        self.panes = {}  # gateway -> deque of (pane index, Pane)
+
+    def add(self, gateway, tag, values, now):
+        index = int(now // self.slide)
+        panes = self.panes.setdefault(gateway, deque())
+        if not panes or panes[-1][0] != index:
+            panes.append((index, Pane()))
+        panes[-1][1].add(tag, values)
+
+    # Summaries for the window made of panes [end - pane_count, end), dropping panes no longer needed
+    def close(self, end):
+        first = end - self.pane_count
+        summaries = {}
+        for gateway, panes in list(self.panes.items()):
+            while panes and panes[0][0] < first:
+                panes.popleft()
+            window_panes = [pane for index, pane in panes if index < end]
+            if window_panes:
+                devices, act_power, modes, voltage_min, voltage_max, messages = merge_panes(window_panes)
+                summaries[gateway] = {
+                    "gateway": gateway,
+                    "window": self.window,
+                    "slide": self.slide,
+                    "window_start": first * self.slide,
+                    "window_end": end * self.slide,
+                    "messages": messages,
+                    "devices": devices,
+                    "ActPower": {"total": act_power},
+                    "Voltage": {"min": voltage_min, "max": voltage_max},
+                    "DeviceMode": {str(mode): count for mode, count in sorted(modes.items())},
+                }
+
+            # The oldest pane is not part of the next window
+            if panes and panes[0][0] == first:
+                panes.popleft()
+            if not panes:
+                del self.panes[gateway]
+        return summaries
+
+
+class FleetAggregator:
+    """Feeds act_value messages into a set of windows and publishes their summaries."""
+
+    def __init__(self, client, windows, summary_topic="d2mesh/{gateway}/summary/{label}"):
+        self.client = client
+        self.windows = windows
+        self.summary_topic = summary_topic
+        self.lock = threading.Lock()
+        self.running = False
+        self.threads = []
+        self.stats = {"messages": 0, "invalid": 0, "summaries": 0}
+
+    # Parse an act_value message, keeping only valid aggregated fields
+    def on_message(self, client, userdata, msg):
+        parts = msg.topic.split("/")
+        if len(parts) != 5 or parts[2] != "lightpost" or parts[4] != "act_value":
+            return
+        gateway, tag = parts[1], parts[3]
+
+        try:
+            payload = json.loads(msg.payload.decode())
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            payload = None
+        if not isinstance(payload, dict):
+            with self.lock:
+                self.stats["invalid"] += 1
+            return
+
+        values = {}
+        for name in AGGREGATED_FIELDS:
+            if name in payload:
+                try:
+                    values[name] = LIGHTPOST_VALIDATORS[name](payload[name])
+                except ValueError:
+                    pass
+
+        now = time.time()
+        with self.lock:
+            self.stats["messages"] += 1
+            for window in self.windows:
+                window.add(gateway, tag, values, now)
+
+    def start(self):
+        self.client.subscribe("d2mesh/+/lightpost/+/act_value")
+        self.running = True
+        for window in self.windows:
+            thread = threading.Thread(target=self.emit_loop, args=(window,), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self.running = False
+        for thread in self.threads:
+            thread.join()
+
+    # Publish the summaries of `window` at every pane boundary
+    def emit_loop(self, window):
+        end = int(time.time() // window.slide) + 1
+        while self.running:
+            delay = end * window.slide - time.time()
+            if delay > 0:
+                time.sleep(min(delay, 0.5))
+                continue
+
+            with self.lock:
+                summaries = window.close(end)
+                self.stats["summaries"] += len(summaries)
+            for gateway, summary in summaries.items():
+                topic = self.summary_topic.format(gateway=gateway, label=window.label)
+                self.client.publish(topic, json.dumps(summary))
+                print(f"Published summary to {topic}: {summary['devices']} devices, {summary['messages']} messages")
+            end += 1
+
+
+# Parse "WINDOW" or "WINDOW:SLIDE" (seconds)
+def parse_window(text):
+    window, _, slide = text.partition(":")
+    return WindowAggregator(float(window), float(slide) if slide else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate lightpost act_value streams into per-window summaries.")
+    parser.add_argument("--broker", default="localhost", help="broker host")
+    parser.add_argument("--port", type=int, default=1883, help="broker port")
+    parser.add_argument("--window", action="append", type=parse_window, dest="windows",
+                        help="WINDOW for a tumbling window or WINDOW:SLIDE for a sliding one, in seconds (repeatable)")
+    args = parser.parse_args()
+
+    # Imported here so the window logic above can be used (and tested) without paho installed
+    import paho.mqtt.client as mqtt
+
+    client = mqtt.Client()
+    aggregator = FleetAggregator(client, args.windows or [WindowAggregator(60)])
+
+    # Subscribe again after every (re)connect
+    def on_connect(client, userdata, flags, rc):
+        if rc == 0:
+            print("Successfully connected to the broker.")
+            client.subscribe("d2mesh/+/lightpost/+/act_value")
+        else:
+            print(f"Failed to connect, return code {rc}")
+
+    client.on_connect = on_connect
+    client.on_message = aggregator.on_message
+
+    try:
+        client.connect(args.broker, args.port, 60)
+    except Exception as e:
+        print(f"Could not connect to broker: {e}")
+        return
+
+    client.loop_start()
+    aggregator.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Program interrupted. Exiting.")
+    finally:
+        aggregator.stop()
+        client.loop_stop()
+        client.disconnect()
+        print(f"Aggregator stats: {aggregator.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -96,10 +96,13 @@ import json
 import time
 
 import paho.mqtt.client as mqtt
+import argparse
 import json
 import time
 import threading
-import os  # For clearing the screen
+
+from console import clear_screen
+from jsoncreate import load_tag_spec, iter_tags, count_tags, tag_at
 
 # Define the MQTT broker details
 broker = 'localhost'  # Adjust if needed for your Docker network
@@ -110,12 +113,11 @@ running = True
 timed_publishing = False  # Switch for toggling timed publishing
 
 
-# Load tags from the generated_topics.txt file
+# Load the tag ranges from tags.json, tags themselves are generated lazily
 try:
-    with open("generated_topics.txt", "r") as file:
-        tags = [line.strip() for line in file.readlines() if line.strip()]
-except FileNotFoundError as e:
-    print(f"Error: Could not find 'generated_topics.txt' file: {e}")
+    tag_spec = load_tag_spec()
+except (json.JSONDecodeError, FileNotFoundError) as e:
+    print(f"Error loading tags.json file: {e}")
     exit(1)
 
 # Load the JSON payloads from the file
@@ -133,7 +135,7 @@ def on_connect(client, userdata, flags, rc):
     if rc == 0:
         print("Successfully connected to the broker.")
         # Subscribe to config and response topics for each tag
-        for tag in tags:
+        for tag in iter_tags(tag_spec):
             config_topic = f"d2mesh/gate2DB48EC0/lightpost/{tag}/config"
             response_topic = f"d2mesh/gate2DB48EC0/lightpost/{tag}/response"
             client.subscribe(config_topic)
@@ -148,13 +150,11 @@ def on_message(client, userdata, msg):
     print(f"Message received from {msg.topic}: {msg.payload.decode()}")
 
     # Automatically copy the message from config topic to the response topic
-    for tag in tags:
-        config_topic = f"d2mesh/gate2DB48EC0/lightpost/{tag}/config"
-        response_topic = f"d2mesh/gate2DB48EC0/lightpost/{tag}/response"
-
-        if msg.topic == config_topic:
-            client.publish(response_topic, msg.payload)
-            print(f"Copied config message to response topic: {response_topic}")
+    parts = msg.topic.split("/")
+    if len(parts) == 5 and parts[2] == "lightpost" and parts[4] == "config":
+        response_topic = f"d2mesh/gate2DB48EC0/lightpost/{parts[3]}/response"
+        client.publish(response_topic, msg.payload)
+        print(f"Copied config message to response topic: {response_topic}")
 
 
 # Function to manually publish to config topic
@@ -171,7 +171,7 @@ def manual_publish(client):
             publish_to_config(client)
 
         elif option == "2":
-            toggle_timed_publishing()
+            toggle_timed_publishing(client)
 
         elif option == "3":
             running = False  # Update the global running flag
@@ -187,15 +187,15 @@ def manual_publish(client):
 # Function to publish a manually entered message to a config topic
 def publish_to_config(client):
     print("\nAvailable tags:")
-    for index, tag in enumerate(tags, 1):
+    for index, tag in enumerate(iter_tags(tag_spec), 1):
         print(f"{index}. {tag}")
     tag_choice = input("Enter the number of the tag to publish to: ").strip()
 
     try:
         tag_index = int(tag_choice) - 1
-        if tag_index < 0 or tag_index >= len(tags):
+        if tag_index < 0 or tag_index >= count_tags(tag_spec):
             raise ValueError("Invalid choice")
-        selected_tag = tags[tag_index]
+        selected_tag = tag_at(tag_spec, tag_index)
         config_topic = f"d2mesh/gate2DB48EC0/lightpost/{selected_tag}/config"
 
         payload = input("Enter the message payload (JSON format): ").strip()
@@ -210,12 +210,20 @@ def publish_to_config(client):
 
 
 # Function to toggle timed publishing on/off
-def toggle_timed_publishing():
+def toggle_timed_publishing(client):
     global timed_publishing
     if not timed_publishing:
+        # Interval selection, asked here so the background thread never reads stdin
+        interval = 60  # Default to 1 minute
+        custom_interval = input("Enter custom interval (in seconds): ").strip()
+        try:
+            interval = int(custom_interval)
+        except ValueError:
+            print("Invalid custom interval. Using default 60 seconds.")
+
         print("Timed publishing is now ON.")
         timed_publishing = True
-        threading.Thread(target=timed_publish, args=(client,), daemon=True).start()  # Start timed publishing in a thread
+        threading.Thread(target=timed_publish, args=(client, interval), daemon=True).start()  # Start timed publishing in a thread
     else:
         print("Timed publishing is now OFF.")
         timed_publishing = False
@@ -224,15 +232,15 @@ def toggle_timed_publishing():
 # Function to publish the entire JSON payload as separate messages
 def publish_full_json_separate_messages(client):
     print("\nAvailable tags:")
-    for index, tag in enumerate(tags, 1):
+    for index, tag in enumerate(iter_tags(tag_spec), 1):
         print(f"{index}. {tag}")
     tag_choice = input("Enter the number of the tag to publish to: ").strip()
 
     try:
         tag_index = int(tag_choice) - 1
-        if tag_index < 0 or tag_index >= len(tags):
+        if tag_index < 0 or tag_index >= count_tags(tag_spec):
             raise ValueError("Invalid choice")
-        selected_tag = tags[tag_index]
+        selected_tag = tag_at(tag_spec, tag_index)
         config_topic = f"d2mesh/gate2DB48EC0/lightpost/{selected_tag}/config"
 
         # Check if payloads is a list
@@ -252,21 +260,13 @@ def publish_full_json_separate_messages(client):
         print(f"Error: {e}")
 
 
-# Function to handle timed publishing every minute (adjustable)
-def timed_publish(client):
+# Function to handle timed publishing every `interval` seconds
+def timed_publish(client, interval=60):
     global timed_publishing
     print("Timed publishing started.")
 
-    # Interval selection
-    interval = 60  # Default to 1 minute
-    custom_interval = input("Enter custom interval (in seconds): ").strip()
-    try:
-        interval = int(custom_interval)
-    except ValueError:
-        print("Invalid custom interval. Using default 60 seconds.")
-
     while timed_publishing:
-        for tag in tags:  # Iterate through all tags
+        for tag in iter_tags(tag_spec):  # Iterate through all tags
             config_topic = f"d2mesh/gate2DB48EC0/lightpost/{tag}/config"
             for payload in payloads:  # Iterate through the list of payloads
                 if isinstance(payload, dict):  # Ensure it's a dictionary
@@ -282,14 +282,6 @@ def timed_publish(client):
             time.sleep(interval)  # Sleep after publishing all payloads for the current tag
 
 
-# Function to clear the screen
-def clear_screen():
-    if os.name == 'nt':  # For Windows
-        os.system('cls')
-    else:  # For Linux and MacOS
-        os.system('clear')
-
-
 # Function to show the options menu
 def show_options_menu():
     print("\nOptions:")
@@ -299,33 +291,59 @@ def show_options_menu():
     print("4. Publish full JSON as separate messages")
 
 
-# Create a new MQTT client instance
-client = mqtt.Client()
-
-# Assign event callbacks
-client.on_connect = on_connect
-client.on_message = on_message
-
-# Connect to the MQTT broker
-client.connect(broker, port, 60)
+def main():
+    global running, timed_publishing
+    parser = argparse.ArgumentParser(description="Publish config messages to the lightposts.")
+    parser.add_argument("--broker", default=broker, help="broker host")
+    parser.add_argument("--port", type=int, default=port, help="broker port")
+    parser.add_argument("--serve", action="store_true", help="only copy config messages to response, without the menu")
+    parser.add_argument("--timed", type=int, metavar="INTERVAL", help="publish payloads.json every N seconds without the menu")
+    parser.add_argument("--duration", type=float, default=0, help="stop a headless run after N seconds (0 = until interrupted)")
+    args = parser.parse_args()
+    headless = args.serve or args.timed
+
+    # Create a new MQTT client instance
+    client = mqtt.Client()
+
+    # Assign event callbacks
+    client.on_connect = on_connect
+    client.on_message = on_message
+
+    # Connect to the MQTT broker
+    client.connect(args.broker, args.port, 60)
+
+    # Run the client in a separate thread to handle messages
+    client.loop_start()
+
+    manual_thread = None
+    if headless:
+        # Headless mode never reads stdin, so the script can run unattended in a pipeline
+        if args.timed:
+            timed_publishing = True
+            threading.Thread(target=timed_publish, args=(client, args.timed), daemon=True).start()
+    else:
+        # Start the manual publishing thread
+        manual_thread = threading.Thread(target=manual_publish, args=(client,))
+        manual_thread.start()
 
-# Run the client in a separate thread to handle messages
-client.loop_start()
+    # Keep the script running until the user chooses to quit, or a headless run's duration is over
+    deadline = time.monotonic() + args.duration if headless and args.duration else None
+    try:
+        while running and (deadline is None or time.monotonic() < deadline):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    running = False
+    timed_publishing = False
 
-# Start the manual publishing thread
-manual_thread = threading.Thread(target=manual_publish, args=(client,))
-manual_thread.start()
+    # Stop the client loop and disconnect
+    client.loop_stop()
+    client.disconnect()
 
-# Keep the script running until the user chooses to quit
-try:
-    while running:
-        time.sleep(1)
-except KeyboardInterrupt:
-    running = False
+    if manual_thread is not None:
+        manual_thread.join()
+    print("Script stopped.")
 
-# Stop the client loop and disconnect
-client.loop_stop()
-client.disconnect()
 
-manual_thread.join()
-print("Script stopped.")
+if __name__ == "__main__":
+    main()
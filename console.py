@@ -0,0 +1,39 @@
+import os
+import sys
+
+# Terminal helpers shared by the interactive scripts (config.py, test.py)
+
+CLEAR = "\033[2J\033[H"
+
+_ansi_enabled = None
+
+
+# Windows 10+ consoles understand ANSI escapes once virtual terminal processing is switched on;
+# older consoles (and redirected handles) refuse, and those keep using `cls`
+def _enable_ansi():
+    if os.name != "nt":
+        return True
+    try:
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.GetStdHandle(-11)  # STD_OUTPUT_HANDLE
+        mode = ctypes.c_uint32()
+        if not kernel32.GetConsoleMode(handle, ctypes.byref(mode)):
+            return False
+        return bool(kernel32.SetConsoleMode(handle, mode.value | 0x0004))  # ENABLE_VIRTUAL_TERMINAL_PROCESSING
+    except (AttributeError, OSError):
+        return False
+
+
+# Function to clear the screen, without forking a shell on every menu redraw where the terminal allows it
+def clear_screen():
+    global _ansi_enabled
+    if not sys.stdout.isatty():  # Nothing to clear when the output is piped or logged
+        return
+    if _ansi_enabled is None:
+        _ansi_enabled = _enable_ansi()
+    if _ansi_enabled:
+        print(CLEAR, end="", flush=True)
+    else:
+        os.system('cls')
@@ -1,29 +1,101 @@
 import json
+import sys
 
-# Load the JSON file with base_tag, start, and end
-json_file = "tags.json"
-try:
-    with open(json_file, 'r') as f:
-        data = json.load(f)
-except FileNotFoundError:
-    print(f"Error: The file {json_file} was not found.")
-    exit(1)
-
-# Extract base tag and range from the JSON
-base_tag = data["base_tag"]
-start_hex = int(data["start"], 16)
-end_hex = int(data["end"], 16)
-
-# Generate the list of topics
-topics = []
-for i in range(start_hex, end_hex + 1):
-    hex_suffix = f"{i:04X}"  # Convert to uppercase hex, 4 digits with padding
-    topics.append(f"{base_tag}{hex_suffix}")
-
-# Save the generated topics to a file
-output_file = "generated_topics.txt"
-with open(output_file, 'w') as f:
-    for topic in topics:
-        f.write(f"{topic}\n")
-
-print(f"Generated {len(topics)} topics. Saved to {output_file}")
+# tags.json can describe tags in several ways:
+#   {"base_tag": "D202E7DF", "start": "0000", "end": "0FFF"}               - single range (original format)
+#   {"base_tag": ["D202E7DF", "D202E7E0"], "start": "0000", "end": "00FF"}  - same range on multiple bases
+#   {"ranges": [{...}, "D202E7DF:0000-00FF,0200-02FF", ...]}               - several ranges / compressed descriptors
+# A compressed descriptor is "BASE:START-END[,START-END...]", a single suffix ("BASE:0010") is also allowed.
+
+DEFAULT_TAG_FILE = "tags.json"
+
+
+# Function to parse a compressed range descriptor into (base_tag, start, end, width) tuples
+def parse_descriptor(descriptor):
+    try:
+        base_tag, spans = descriptor.split(":", 1)
+    except ValueError:
+        raise ValueError(f"Invalid range descriptor '{descriptor}', expected BASE:START-END")
+
+    for span in spans.split(","):
+        span = span.strip()
+        if not span:
+            continue
+        start, _, end = span.partition("-")
+        end = end or start
+        yield base_tag.strip(), int(start, 16), int(end, 16), max(len(start), len(end))
+
+
+# Function to turn one entry of the tag spec into (base_tag, start, end, width) tuples
+def iter_ranges(spec):
+    if isinstance(spec, str):
+        yield from parse_descriptor(spec)
+    elif isinstance(spec, list):
+        for entry in spec:
+            yield from iter_ranges(entry)
+    elif "ranges" in spec:
+        yield from iter_ranges(spec["ranges"])
+    else:
+        base_tags = spec["base_tag"]
+        if isinstance(base_tags, str):
+            base_tags = [base_tags]
+        width = max(len(spec["start"]), len(spec["end"]))
+        for base_tag in base_tags:
+            yield base_tag, int(spec["start"], 16), int(spec["end"], 16), width
+
+
+# Generator yielding every tag described by the spec, one at a time
+def iter_tags(spec):
+    for base_tag, start, end, width in iter_ranges(spec):
+        for i in range(start, end + 1):
+            yield f"{base_tag}{i:0{width}X}"
+
+
+# Number of tags described by the spec, without generating them
+def count_tags(spec):
+    return sum(end - start + 1 for _, start, end, _ in iter_ranges(spec) if end >= start)
+
+
+# Tag at a zero-based position in the spec, without generating the tags before it
+def tag_at(spec, index):
+    if index < 0:
+        raise IndexError("tag index out of range")
+    for base_tag, start, end, width in iter_ranges(spec):
+        size = end - start + 1
+        if size <= 0:
+            continue
+        if index < size:
+            return f"{base_tag}{start + index:0{width}X}"
+        index -= size
+    raise IndexError("tag index out of range")
+
+
+# Load the tag spec from a JSON file
+def load_tag_spec(path=DEFAULT_TAG_FILE):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def main():
+    json_file = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_TAG_FILE
+    output_file = sys.argv[2] if len(sys.argv) > 2 else "generated_topics.txt"
+
+    # Load the JSON file with the tag ranges
+    try:
+        spec = load_tag_spec(json_file)
+    except FileNotFoundError:
+        print(f"Error: The file {json_file} was not found.")
+        exit(1)
+
+    # Stream the generated topics straight into the file
+    count = 0
+    with open(output_file, 'w') as f:
+        for topic in iter_tags(spec):
+            f.write(f"{topic}\n")
+            count += 1
+
+    print(f"Generated {count} topics. Saved to {output_file}")
+
+
+if __name__ == "__main__":
+    main()
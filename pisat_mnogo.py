@@ -1,8 +1,11 @@
-import paho.mqtt.client as mqtt
+import argparse
 import json
 import time
 import threading
 
+from records import load_records
+from pool import ClientPool
+
 # Define the MQTT broker details
 broker = 'localhost'
 port = 1883
@@ -12,10 +15,9 @@ running = True
 timed_publishing = False
 publish_interval = 60  # Default interval (in seconds) for timed publishing
 
-# Load the payload data from pisat.json
+# Load the payload data from pisat.json as compact DeviceRecords
 try:
-    with open("pisat.json", "r") as file:
-        payloads = json.load(file)
+    payloads = load_records("pisat.json")
 except FileNotFoundError as e:
     print(f"Error: Could not find the pisat.json file: {e}")
     exit(1)
@@ -23,13 +25,6 @@ except json.JSONDecodeError as e:
     print(f"Error: Invalid JSON format in pisat.json: {e}")
     exit(1)
 
-# Callback when the client receives a CONNACK response from the server
-def on_connect(client, userdata, flags, rc):
-    if rc == 0:
-        print("Successfully connected to the broker.")
-    else:
-        print(f"Failed to connect, return code {rc}")
-
 # Function for timed publishing
 def publish_timed(client):
     while running and timed_publishing:
@@ -40,7 +35,7 @@ def publish_timed(client):
 def publish_all_topics(client):
     for topic, payload in payloads.items():
         topic_full = f"d2mesh/gate2DB48EC0/lightpost/{topic}/act_value"
-        client.publish(topic_full, json.dumps(payload))
+        client.publish(topic_full, payload.encode())
         print(f"Published to {topic_full}: {payload}")
 
 # Start timed publishing thread
@@ -68,17 +63,9 @@ def set_publish_interval():
     except ValueError:
         print("Invalid input. Please enter a valid number.")
 
-# Create an MQTT client instance and configure callbacks
-client = mqtt.Client()
-client.on_connect = on_connect
-
-# Connect to the MQTT broker
-client.connect(broker, port, 60)
-
-# Main loop
-try:
-    client.loop_start()
-
+# Interactive menu loop
+def interactive_menu(client):
+    global running
     while running:
         print("\nOptions:")
         print("1. Publish all topics once")
@@ -100,12 +87,60 @@ try:
         elif choice == "5":
             running = False
             stop_timed_publishing()
-            client.loop_stop()
             print("Exiting the program.")
         else:
             print("Invalid option. Please try again.")
 
-except KeyboardInterrupt:
-    print("Interrupted by user. Exiting...")
-    running = False
-    client.loop_stop()
+# Headless mode: publish once, or every `interval` seconds for `duration` seconds (0 = until interrupted)
+def headless(client, once, interval, duration):
+    global publish_interval
+    if once:
+        publish_all_topics(client)
+        return
+
+    publish_interval = interval
+    deadline = time.monotonic() + duration if duration else None
+    while running and (deadline is None or time.monotonic() < deadline):
+        publish_all_topics(client)
+        remaining = publish_interval if deadline is None else deadline - time.monotonic()
+        time.sleep(max(0, min(publish_interval, remaining)))
+
+def main():
+    global running
+    parser = argparse.ArgumentParser(description="Publish act_value for every lightpost in pisat.json.")
+    parser.add_argument("--broker", default=broker, help="broker host")
+    parser.add_argument("--port", type=int, default=port, help="broker port")
+    parser.add_argument("--once", action="store_true", help="publish all topics once and exit")
+    parser.add_argument("--interval", type=int, help="publish every N seconds without the menu")
+    parser.add_argument("--duration", type=float, default=0, help="stop timed publishing after N seconds")
+    parser.add_argument("--connections", type=int, default=1, help="spread the lightposts over N MQTT connections")
+    args = parser.parse_args()
+
+    # Create the MQTT connections, each lightpost always publishes through the same one
+    client = ClientPool(args.connections, args.broker, args.port)
+
+    # Connect to the MQTT broker
+    try:
+        client.connect()
+        print(f"Successfully connected to the broker with {args.connections} connection(s).")
+    except (OSError, RuntimeError) as e:
+        print(f"Could not connect to broker: {e}")
+        client.disconnect()
+        return
+
+    try:
+        if args.once or args.interval:
+            headless(client, args.once, args.interval or publish_interval, args.duration)
+        else:
+            interactive_menu(client)
+    except KeyboardInterrupt:
+        print("Interrupted by user. Exiting...")
+    finally:
+        running = False
+        stop_timed_publishing()
+        client.disconnect()
+        for stats in client.report():
+            print(f"Connection {stats['connection']}: {stats['published']} published, {stats['bytes']} bytes")
+
+if __name__ == "__main__":
+    main()
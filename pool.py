@@ -0,0 +1,154 @@
+import paho.mqtt.client as mqtt
+import bisect
+import hashlib
+import threading
+import time
+import uuid
+
+
+# Stable 64-bit hash used for the consistent hashing ring
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+# Size of a payload on the wire; paho sends str (and int/float) payloads as UTF-8
+def _payload_size(payload):
+    if payload is None:
+        return 0
+    if isinstance(payload, (bytes, bytearray)):
+        return len(payload)
+    return len(str(payload).encode())
+
+
+# Routing key for a topic: the lightpost tag when there is one, otherwise the topic itself
+def key_for_topic(topic):
+    parts = topic.split("/")
+    if len(parts) > 3 and parts[2] == "lightpost":
+        return parts[3]
+    return topic
+
+
+class ClientPool:
+    """Spreads simulated devices over several MQTT connections.
+
+    Tags are assigned to connections with consistent hashing, so a device always uses the same
+    connection and resizing the pool only moves a fraction of the devices. publish() and
+    subscribe() take the same arguments as on a single paho client, which makes the pool a
+    drop-in replacement; the connection is picked from the tag in the topic.
+    """
+
+    def __init__(self, size, broker, port, client_id_prefix="d2mesh-sim", replicas=64, on_message=None,
+                 protocol=mqtt.MQTTv311):
+        self.broker = broker
+        self.port = port
+        self.on_message = on_message
+        self.message_callbacks = []
+        self.lock = threading.Lock()
+        self.clients = []
+        self.stats = []
+        self.subscriptions = []
+        self.connected = []
+
+        # Client ids are unique per pool, so two simulators on the same broker don't knock each other off
+        session = uuid.uuid4().hex[:8]
+        for index in range(size):
+            client = mqtt.Client(client_id=f"{client_id_prefix}-{session}-{index}", protocol=protocol)
+            client.user_data_set(index)
+            client.on_connect = self._on_connect
+            client.on_disconnect = self._on_disconnect
+            client.on_message = self._on_message
+            self.clients.append(client)
+            self.stats.append({"published": 0, "bytes": 0, "received": 0, "subscriptions": 0, "reconnects": 0})
+            self.subscriptions.append({})
+            self.connected.append(threading.Event())
+
+        # Each connection gets `replicas` points on the ring to even out the distribution
+        self.ring = sorted((_hash(f"{index}#{replica}"), index) for index in range(size) for replica in range(replicas))
+        self.ring_keys = [point for point, _ in self.ring]
+
+    def _on_connect(self, client, index, flags, rc, properties=None):
+        if rc != 0:
+            print(f"Connection {index} failed, return code {rc}")
+            return
+        # Restore this connection's subscriptions after a reconnect
+        with self.lock:
+            topics = list(self.subscriptions[index].items())
+            if self.connected[index].is_set():
+                self.stats[index]["reconnects"] += 1
+            self.connected[index].set()
+        if topics:
+            client.subscribe(topics)
+
+    def _on_disconnect(self, client, index, rc, properties=None):
+        if rc != 0:
+            print(f"Connection {index} lost, return code {rc}")
+
+    def _on_message(self, client, index, msg):
+        with self.lock:
+            self.stats[index]["received"] += 1
+
+        # Like paho, topic-specific callbacks take precedence over on_message
+        handled = False
+        for sub, callback in self.message_callbacks:
+            if mqtt.topic_matches_sub(sub, msg.topic):
+                callback(client, index, msg)
+                handled = True
+        if not handled and self.on_message is not None:
+            self.on_message(client, index, msg)
+
+    # Register a callback for messages matching a topic filter on every connection
+    def message_callback_add(self, sub, callback):
+        self.message_callbacks.append((sub, callback))
+
+    # Index of the connection that owns a tag (or any other routing key)
+    def index_for(self, key):
+        position = bisect.bisect(self.ring_keys, _hash(key)) % len(self.ring)
+        return self.ring[position][1]
+
+    def client_for(self, key):
+        return self.clients[self.index_for(key)]
+
+    def connect(self, keepalive=60, timeout=10):
+        for client in self.clients:
+            client.connect(self.broker, self.port, keepalive)
+            client.loop_start()
+
+        deadline = time.monotonic() + timeout
+        for index, event in enumerate(self.connected):
+            if not event.wait(max(0, deadline - time.monotonic())):
+                raise RuntimeError(f"Timed out waiting for connection {index}")
+
+    def publish(self, topic, payload=None, qos=0, retain=False, properties=None, key=None):
+        index = self.index_for(key or key_for_topic(topic))
+        info = self.clients[index].publish(topic, payload, qos, retain, properties=properties)
+        with self.lock:
+            stats = self.stats[index]
+            stats["published"] += 1
+            stats["bytes"] += _payload_size(payload)
+        return info
+
+    # Subscribe to a topic or a list of (topic, qos) tuples, batching one SUBSCRIBE per connection
+    def subscribe(self, topic, qos=0, key=None):
+        topics = [(topic, qos)] if isinstance(topic, str) else topic
+        batches = {}
+        for name, topic_qos in topics:
+            batches.setdefault(self.index_for(key or key_for_topic(name)), []).append((name, topic_qos))
+
+        for index, batch in batches.items():
+            with self.lock:
+                new = [name for name, _ in batch if name not in self.subscriptions[index]]
+                self.subscriptions[index].update(batch)
+                self.stats[index]["subscriptions"] += len(new)
+                send = self.connected[index].is_set()
+            if send:
+                self.clients[index].subscribe(batch)
+
+    def disconnect(self):
+        for client in self.clients:
+            client.disconnect()
+            client.loop_stop()
+
+    # Per-connection statistics
+    def report(self):
+        with self.lock:
+            return [{"connection": index, **stats} for index, stats in enumerate(self.stats)]
@@ -0,0 +1,113 @@
+import json
+import sys
+import tracemalloc
+
+from schema import LIGHTPOST_SCHEMA
+
+# Field registry for lightpost act_value data, in publish order
+FIELDS = tuple(LIGHTPOST_SCHEMA)
+
+
+class DeviceRecord:
+    """Compact act_value record for one lightpost.
+
+    Known fields live in slots, anything else goes to a small overflow dict that is only
+    created when needed. The JSON encoding is built when publishing and not kept, so a
+    record stays the same size after it has been published.
+    """
+
+    __slots__ = FIELDS + ("extra",)
+
+    def __init__(self, values=None):
+        self.extra = None
+        if values:
+            self.update(values)
+
+    def __contains__(self, name):
+        if name in FIELDS:
+            return hasattr(self, name)
+        return self.extra is not None and name in self.extra
+
+    def __getitem__(self, name):
+        if name in FIELDS:
+            try:
+                return getattr(self, name)
+            except AttributeError:
+                raise KeyError(name)
+        if self.extra is None:
+            raise KeyError(name)
+        return self.extra[name]
+
+    def __setitem__(self, name, value):
+        if name in FIELDS:
+            setattr(self, name, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[name] = value
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def update(self, values):
+        for name, value in values.items():
+            self[name] = value
+
+    def to_dict(self):
+        data = {name: getattr(self, name) for name in FIELDS if hasattr(self, name)}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    # JSON payload as bytes, ready to publish
+    def encode(self):
+        return json.dumps(self.to_dict()).encode()
+
+
+# Load a pisat.json style file into a dict of tag -> DeviceRecord
+def load_records(path="pisat.json"):
+    with open(path, "r") as f:
+        return {tag: DeviceRecord(values) for tag, values in json.load(f).items()}
+
+
+# Save a dict of tag -> DeviceRecord back to a pisat.json style file
+def dump_records(records, path="pisat.json"):
+    with open(path, "w") as f:
+        json.dump({tag: record.to_dict() for tag, record in records.items()}, f, indent=4)
+
+
+# Measure the memory used by `count` devices held as plain dicts and as DeviceRecords,
+# once after loading and once after every device has been encoded for publishing
+def measure(count=4096):
+    sample = {
+        "Timestamp": 2222, "Longitude": 22.22, "Latitude": 2, "Voltage": 380,
+        "ActPower": 623, "Voltage_1": 210, "LightPower": 100, "DeviceMode": 1,
+    }
+    kinds = (
+        ("dict", dict, lambda device: json.dumps(device).encode()),
+        ("DeviceRecord", DeviceRecord, DeviceRecord.encode),
+    )
+    results = {}
+    for name, make, encode in kinds:
+        encode(make(sample))  # One-off allocations inside json are not per-device memory
+        tracemalloc.start()
+        devices = {f"D202E7DF{i:04X}": make(sample) for i in range(count)}
+        results[name] = tracemalloc.get_traced_memory()[0]
+        for device in devices.values():
+            encode(device)
+        results[f"{name} after publish"] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del devices
+    return results
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 4096
+    for name, size in measure(count).items():
+        print(f"{name}: {size} bytes for {count} devices ({size / count:.0f} bytes per device)")
@@ -0,0 +1,273 @@
+import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+from jsoncreate import load_tag_spec, iter_tags, count_tags
+from pool import ClientPool
+
+# Request/response over d2mesh/<gateway>/lightpost/<tag>/request and /response.
+#
+# Every request gets an id. By default it is embedded in the payload as
+# {"request_id": "...", "variables": [...]} and echoed back by the gateway (test.py);
+# with use_v5=True it goes in the MQTT v5 CorrelationData property and the payload stays a plain list.
+
+
+class RequestTimeout(Exception):
+    pass
+
+
+class LatencyHistogram:
+    """Latency histogram with power-of-two millisecond buckets (<=0.125 ms, <=0.25 ms, ... <=~65 s)."""
+
+    BOUNDS = [2 ** exponent / 8 for exponent in range(20)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, latency_ms):
+        index = 0
+        while index < len(self.BOUNDS) and latency_ms > self.BOUNDS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += latency_ms
+        self.min = latency_ms if self.min is None else min(self.min, latency_ms)
+        self.max = latency_ms if self.max is None else max(self.max, latency_ms)
+
+    # Upper bound of the bucket holding the given percentile, clamped to the recorded min/max
+    # so a bucket edge is never reported beyond the latencies actually seen
+    def percentile(self, percent):
+        if not self.count:
+            return None
+        target = self.count * percent / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                bound = self.BOUNDS[index] if index < len(self.BOUNDS) else self.max
+                return max(self.min, min(bound, self.max))
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "min_ms": self.min,
+            "max_ms": self.max,
+            "mean_ms": self.total / self.count if self.count else None,
+            "p50_ms": self.percentile(50),
+            "p90_ms": self.percentile(90),
+            "p99_ms": self.percentile(99),
+            "buckets": {
+                f"<={bound}" if index < len(self.BOUNDS) else f">{self.BOUNDS[-1]}": count
+                for index, (bound, count) in enumerate(zip(self.BOUNDS + [None], self.counts))
+                if count
+            },
+        }
+
+
+class RequestClient:
+    """Issues correlated requests to lightposts and matches the responses.
+
+    `client` is a paho client or a ClientPool. request() returns a concurrent.futures.Future
+    (request_async() an awaitable) that resolves to the response payload, or fails with
+    RequestTimeout when no response arrives in time.
+    """
+
+    def __init__(self, client, gateway="gate2DB48EC0", timeout=5.0, use_v5=False):
+        self.client = client
+        self.gateway = gateway
+        self.timeout = timeout
+        self.use_v5 = use_v5
+        self.prefix = uuid.uuid4().hex[:8]
+        self.ids = itertools.count()
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.deadlines = []
+        self.histogram = LatencyHistogram()
+        self.stats = {"sent": 0, "completed": 0, "timed_out": 0, "unmatched": 0}
+        self.running = False
+        self.sweeper = None
+
+    # Start matching responses. With `tags`, only those tags' response topics are subscribed (each on
+    # its own connection when `client` is a ClientPool); an empty list leaves subscribing to the caller.
+    def start(self, tags=None):
+        self.client.message_callback_add(f"d2mesh/{self.gateway}/lightpost/+/response", self.on_response)
+        if tags is None:
+            self.client.subscribe(f"d2mesh/{self.gateway}/lightpost/+/response")
+        else:
+            topics = [(f"d2mesh/{self.gateway}/lightpost/{tag}/response", 0) for tag in tags]
+            if topics:
+                self.client.subscribe(topics)
+        self.running = True
+        self.sweeper = threading.Thread(target=self.sweep, daemon=True)
+        self.sweeper.start()
+
+    def stop(self):
+        self.running = False
+        if self.sweeper is not None:
+            self.sweeper.join()
+
+    def request(self, tag, variables, timeout=None):
+        request_id = f"{self.prefix}-{next(self.ids)}"
+        topic = f"d2mesh/{self.gateway}/lightpost/{tag}/request"
+        future = Future()
+        sent_at = time.monotonic()
+        deadline = sent_at + (self.timeout if timeout is None else timeout)
+
+        with self.lock:
+            self.pending[request_id] = (future, sent_at)
+            heapq.heappush(self.deadlines, (deadline, request_id))
+            self.stats["sent"] += 1
+
+        if self.use_v5:
+            properties = Properties(PacketTypes.PUBLISH)
+            properties.CorrelationData = request_id.encode()
+            properties.ResponseTopic = f"d2mesh/{self.gateway}/lightpost/{tag}/response"
+            self.client.publish(topic, json.dumps(list(variables)), properties=properties)
+        else:
+            self.client.publish(topic, json.dumps({"request_id": request_id, "variables": list(variables)}))
+        return future
+
+    async def request_async(self, tag, variables, timeout=None):
+        return await asyncio.wrap_future(self.request(tag, variables, timeout))
+
+    def on_response(self, client, userdata, msg):
+        try:
+            payload = json.loads(msg.payload.decode())
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            payload = None
+
+        correlation_data = getattr(getattr(msg, "properties", None), "CorrelationData", None)
+        if correlation_data is not None:
+            request_id = correlation_data.decode()
+        elif isinstance(payload, dict):
+            request_id = payload.pop("request_id", None)
+        else:
+            request_id = None
+
+        with self.lock:
+            entry = self.pending.pop(request_id, None)
+            if entry is None:
+                # Config echoes, late responses after a timeout, or requests from other clients
+                self.stats["unmatched"] += 1
+                return
+            future, sent_at = entry
+            self.histogram.record((time.monotonic() - sent_at) * 1000)
+            self.stats["completed"] += 1
+
+        if not future.cancelled():
+            future.set_result(payload)
+
+    # Fail requests whose deadline has passed; the heap keeps this cheap with many requests in flight
+    def sweep(self):
+        while self.running:
+            expired = []
+            now = time.monotonic()
+            with self.lock:
+                while self.deadlines and self.deadlines[0][0] <= now:
+                    _, request_id = heapq.heappop(self.deadlines)
+                    entry = self.pending.pop(request_id, None)
+                    if entry is not None:
+                        self.stats["timed_out"] += 1
+                        expired.append((request_id, entry[0]))
+            for request_id, future in expired:
+                if not future.cancelled():
+                    future.set_exception(RequestTimeout(f"No response to request {request_id}"))
+            time.sleep(0.01)
+
+    def in_flight(self):
+        with self.lock:
+            return len(self.pending)
+
+    def _snapshot(self):
+        return {**self.stats, "in_flight": len(self.pending), "latency": self.histogram.summary()}
+
+    def report(self):
+        with self.lock:
+            return self._snapshot()
+
+    # Return the report and start counting from zero, keeping requests that are still in flight
+    def reset(self):
+        with self.lock:
+            report = self._snapshot()
+            self.stats = dict.fromkeys(self.stats, 0)
+            self.histogram = LatencyHistogram()
+        return report
+
+
+# Pipeline `count` requests over the tags, keeping at most `concurrency` in flight
+def run_requests(rpc, tags, variables, count, concurrency):
+    slots = threading.Semaphore(concurrency)
+    futures = []
+    for tag in itertools.islice(tags, count):
+        slots.acquire()
+        future = rpc.request(tag, variables)
+        future.add_done_callback(lambda _: slots.release())
+        futures.append(future)
+
+    for future in futures:
+        try:
+            future.result()
+        except RequestTimeout:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline correlated requests against the lightpost gateway.")
+    parser.add_argument("--broker", default="localhost", help="broker host")
+    parser.add_argument("--port", type=int, default=1883, help="broker port")
+    parser.add_argument("--gateway", default="gate2DB48EC0", help="gateway id in the topic")
+    parser.add_argument("--tags", default="tags.json", help="tags.json style file")
+    parser.add_argument("--devices", type=int, default=0, help="only use the first N tags (0 = all)")
+    parser.add_argument("--variables", nargs="+", default=["Voltage", "ActPower"], help="variables to request")
+    parser.add_argument("--count", type=int, default=1000, help="number of requests")
+    parser.add_argument("--concurrency", type=int, default=100, help="maximum requests in flight")
+    parser.add_argument("--timeout", type=float, default=5.0, help="per-request timeout in seconds")
+    parser.add_argument("--connections", type=int, default=1, help="number of MQTT connections")
+    parser.add_argument("--v5", action="store_true", help="use MQTT v5 CorrelationData instead of an embedded id")
+    args = parser.parse_args()
+
+    tag_spec = load_tag_spec(args.tags)
+
+    # Lazily cycle over the first `devices` tags (nothing for an empty tag spec, instead of spinning forever)
+    def cycle_tags():
+        if not count_tags(tag_spec):
+            return
+        while True:
+            yield from itertools.islice(iter_tags(tag_spec), args.devices or None)
+
+    protocol = mqtt.MQTTv5 if args.v5 else mqtt.MQTTv311
+    pool = ClientPool(args.connections, args.broker, args.port, client_id_prefix="d2mesh-rpc", protocol=protocol)
+    rpc = RequestClient(pool, args.gateway, args.timeout, use_v5=args.v5)
+
+    try:
+        pool.connect()
+        rpc.start(itertools.islice(iter_tags(tag_spec), min(args.devices or args.count, args.count)))
+        start = time.monotonic()
+        run_requests(rpc, cycle_tags(), args.variables, args.count, args.concurrency)
+        elapsed = time.monotonic() - start
+    finally:
+        rpc.stop()
+        pool.disconnect()
+
+    report = rpc.report()
+    report["elapsed"] = round(elapsed, 3)
+    report["rate"] = round(report["completed"] / elapsed, 1) if elapsed > 0 else None
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
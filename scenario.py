@@ -0,0 +1,275 @@
+import argparse
+import json
+import time
+import threading
+from concurrent.futures import wait
+from itertools import islice
+
+from jsoncreate import load_tag_spec, iter_tags, count_tags
+from records import DeviceRecord, load_records
+from pool import ClientPool
+from rpc import RequestClient
+
+# Headless scenario runner. A scenario file (JSON, or YAML when PyYAML is installed) looks like:
+#
+# {
+#     "broker": "localhost",
+#     "port": 1883,
+#     "gateway": "gate2DB48EC0",
+#     "tags": "tags.json",
+#     "report": "scenario_report.json",
+#     "connections": 4,
+#     "phases": [
+#         {"type": "connect", "devices": 256},
+#         {"type": "publish", "rate": 500, "duration": 30},
+#         {"type": "config_burst", "payloads_file": "badpisat.json", "devices": 64},
+#         {"type": "request", "variables": ["Voltage", "ActPower"], "rate": 200, "timeout": 5},
+#         {"type": "sleep", "duration": 2}
+#     ]
+# }
+#
+# "tags" is either a path to a tags.json style file or an inline tag spec (see jsoncreate.py).
+# Phases without "devices" use the devices selected by the last connect phase.
+# Devices are spread over "connections" MQTT connections, see pool.py.
+
+DEFAULT_SCENARIO = {
+    "broker": "localhost",
+    "port": 1883,
+    "gateway": "gate2DB48EC0",
+    "tags": "tags.json",
+    "act_values": "pisat.json",
+    "report": "scenario_report.json",
+    "connections": 1,
+    "phases": [],
+}
+
+
+# Load a scenario from a JSON or YAML file
+def load_scenario(path):
+    with open(path, "r") as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise RuntimeError("PyYAML is required for YAML scenarios (pip install pyyaml)")
+            scenario = yaml.safe_load(f)
+        else:
+            scenario = json.load(f)
+
+    # An empty YAML file loads as None, a JSON file may hold a list
+    if not isinstance(scenario, dict):
+        raise ValueError(f"Scenario file {path} must contain a mapping, got {type(scenario).__name__}")
+    return {**DEFAULT_SCENARIO, **scenario}
+
+
+# Load a JSON file and return its "payloads" list
+def load_payloads(path):
+    with open(path, "r") as f:
+        return [payload for payload in json.load(f).get("payloads", []) if isinstance(payload, dict)]
+
+
+class ScenarioRunner:
+    def __init__(self, scenario):
+        self.scenario = scenario
+        self.gateway = scenario["gateway"]
+
+        tags = scenario["tags"]
+        self.tag_spec = load_tag_spec(tags) if isinstance(tags, str) else tags
+        self.devices = count_tags(self.tag_spec)
+
+        try:
+            self.act_values = load_records(scenario["act_values"])
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.act_values = {}
+        self.default_act_value = next(iter(self.act_values.values()), DeviceRecord())
+
+        self.connected = False
+        self.lock = threading.Lock()
+        self.received = {"act_value": 0, "other": 0}
+
+        self.pool = ClientPool(
+            int(scenario["connections"]), scenario["broker"], scenario["port"], on_message=self.on_message
+        )
+        self.rpc = RequestClient(self.pool, self.gateway)
+
+    def on_message(self, client, index, msg):
+        kind = msg.topic.rsplit("/", 1)[-1]
+        with self.lock:
+            self.received[kind if kind in self.received else "other"] += 1
+
+    def topic(self, tag, kind):
+        return f"d2mesh/{self.gateway}/lightpost/{tag}/{kind}"
+
+    # Lazily iterate the first `devices` tags, starting over once they are exhausted
+    # (nothing when there are no devices, so a paced publish ends instead of spinning forever)
+    def cycle_tags(self, devices):
+        if devices <= 0:
+            return
+        while True:
+            for tag in islice(iter_tags(self.tag_spec), devices):
+                yield tag
+
+    # Publish (topic, payload) pairs at `rate` msgs/s (0 = as fast as possible) until the deadline.
+    # `send` replaces pool.publish for messages that are not plain publishes.
+    def paced_publish(self, messages, rate, deadline=None, send=None):
+        send = send or self.pool.publish
+        sent = 0
+        start = time.monotonic()
+        for topic, payload in messages:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            if rate:
+                delay = start + sent / rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            send(topic, payload)
+            sent += 1
+        return sent
+
+    def phase_devices(self, phase):
+        return max(0, min(int(phase.get("devices", self.devices)), count_tags(self.tag_spec)))
+
+    def run_connect(self, phase):
+        if not self.connected:
+            self.pool.connect(timeout=phase.get("timeout", 10))
+            self.rpc.start(tags=[])
+            self.connected = True
+        self.devices = self.phase_devices(phase)
+
+        # Each device listens on its own connection for responses and act_value echoes
+        self.pool.subscribe([
+            (self.topic(tag, kind), 0)
+            for tag in islice(iter_tags(self.tag_spec), self.devices)
+            for kind in ("response", "act_value")
+        ])
+        return {"devices": self.devices, "connections": len(self.pool.clients)}
+
+    def run_publish(self, phase):
+        devices = self.phase_devices(phase)
+        duration = float(phase.get("duration", 10))
+        messages = (
+            (self.topic(tag, "act_value"), self.act_values.get(tag, self.default_act_value).encode())
+            for tag in self.cycle_tags(devices)
+        )
+        sent = self.paced_publish(messages, float(phase.get("rate", 0)), time.monotonic() + duration)
+        return {"devices": devices, "sent": sent}
+
+    def run_config_burst(self, phase):
+        devices = self.phase_devices(phase)
+        if "payloads" in phase:
+            payloads = phase["payloads"]
+        else:
+            payloads = load_payloads(phase.get("payloads_file", "payloads.json"))
+        messages = (
+            (self.topic(tag, "config"), json.dumps(payload))
+            for tag in islice(iter_tags(self.tag_spec), devices)
+            for payload in payloads
+        )
+        sent = self.paced_publish(messages, float(phase.get("rate", 0)))
+        return {"devices": devices, "sent": sent}
+
+    def run_request(self, phase):
+        devices = self.phase_devices(phase)
+        variables = phase.get("variables", ["Voltage", "ActPower"])
+        timeout = float(phase.get("timeout", 5))
+        futures = []
+
+        # Correlated requests through rpc.py, so lost responses and per-request latency are reported
+        self.rpc.reset()
+        messages = ((tag, variables) for tag in islice(iter_tags(self.tag_spec), devices))
+        sent = self.paced_publish(
+            messages,
+            float(phase.get("rate", 0)),
+            send=lambda tag, variables: futures.append(self.rpc.request(tag, variables, timeout)),
+        )
+        wait(futures)
+        rpc_report = self.rpc.reset()
+        return {
+            "devices": devices,
+            "sent": sent,
+            "responses": rpc_report["completed"],
+            "timed_out": rpc_report["timed_out"],
+            "latency": rpc_report["latency"],
+        }
+
+    def run_sleep(self, phase):
+        time.sleep(float(phase.get("duration", 1)))
+        return {}
+
+    def run(self):
+        report = {"scenario": self.scenario.get("name", ""), "started_at": time.time(), "phases": []}
+        try:
+            for index, phase in enumerate(self.scenario["phases"], 1):
+                handler = getattr(self, f"run_{phase.get('type')}", None)
+                if handler is None:
+                    raise ValueError(f"Unknown phase type '{phase.get('type')}' in phase {index}")
+
+                if phase["type"] != "connect" and not self.connected:
+                    self.run_connect({})
+
+                start = time.monotonic()
+                result = handler(phase)
+                elapsed = time.monotonic() - start
+                result.update({"phase": index, "type": phase["type"], "elapsed": round(elapsed, 3)})
+                if "sent" in result and elapsed > 0:
+                    result["rate"] = round(result["sent"] / elapsed, 1)
+                report["phases"].append(result)
+                print(f"Phase {index} ({phase['type']}): {result}")
+        finally:
+            self.rpc.stop()
+            self.pool.disconnect()
+
+        with self.lock:
+            report["received"] = dict(self.received)
+        report["sent"] = sum(phase.get("sent", 0) for phase in report["phases"])
+        report["elapsed"] = round(sum(phase["elapsed"] for phase in report["phases"]), 3)
+        report["connections"] = self.pool.report()
+        return report
+
+
+# Build a one-phase scenario from command-line options when no scenario file is given
+def scenario_from_args(args):
+    scenario = dict(DEFAULT_SCENARIO)
+    scenario["phases"] = [
+        {"type": "connect", "devices": args.devices or count_tags(load_tag_spec(scenario["tags"]))},
+        {"type": "publish", "rate": args.rate, "duration": args.duration},
+    ]
+    return scenario
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an MQTT load scenario without user input.")
+    parser.add_argument("scenario", nargs="?", help="scenario file (.json, .yaml or .yml)")
+    parser.add_argument("--broker", help="override the broker host")
+    parser.add_argument("--port", type=int, help="override the broker port")
+    parser.add_argument("--report", help="where to write the JSON performance report")
+    parser.add_argument("--connections", type=int, help="number of MQTT connections to spread devices over")
+    parser.add_argument("--devices", type=int, default=0, help="devices to simulate without a scenario file")
+    parser.add_argument("--rate", type=float, default=100, help="msgs/s without a scenario file")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to publish without a scenario file")
+    args = parser.parse_args()
+
+    try:
+        scenario = load_scenario(args.scenario) if args.scenario else scenario_from_args(args)
+    except (FileNotFoundError, ValueError, RuntimeError) as e:
+        print(f"Error loading scenario: {e}")
+        exit(1)
+
+    if args.broker:
+        scenario["broker"] = args.broker
+    if args.port:
+        scenario["port"] = args.port
+    if args.report:
+        scenario["report"] = args.report
+    if args.connections:
+        scenario["connections"] = args.connections
+
+    report = ScenarioRunner(scenario).run()
+
+    with open(scenario["report"], "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Sent {report['sent']} messages in {report['elapsed']} s. Report saved to {scenario['report']}")
+
+
+if __name__ == "__main__":
+    main()
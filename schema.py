@@ -0,0 +1,106 @@
+import math
+
+# Device schemas: field name -> type, allowed range and unit.
+# Schemas are compiled once into validator functions and used to apply config payloads,
+# so unknown keys and badly typed values never reach the stored act_value data.
+
+LIGHTPOST_SCHEMA = {
+    "Timestamp": {"type": "int", "min": 0, "unit": "s"},
+    "Longitude": {"type": "float", "min": -180, "max": 180, "unit": "deg"},
+    "Latitude": {"type": "float", "min": -90, "max": 90, "unit": "deg"},
+    "Voltage": {"type": "int", "min": 0, "max": 1000, "unit": "V"},
+    "ActPower": {"type": "int", "min": 0, "max": 100000, "unit": "W"},
+    "Voltage_1": {"type": "int", "min": 0, "max": 1000, "unit": "V"},
+    "LightPower": {"type": "int", "min": 0, "max": 100, "unit": "%"},
+    "DeviceMode": {"type": "int", "min": 0, "max": 255},
+    "Interval": {"type": "int", "min": 1, "max": 86400, "unit": "s"},
+    "RFChannel": {"type": "int", "min": 0, "max": 255},
+}
+
+CORE_SCHEMA = {
+    "Timestamp": {"type": "int", "min": 0, "unit": "s"},
+    "Voltage": {"type": "int", "min": 0, "max": 1000, "unit": "V"},
+    "Power": {"type": "int", "min": 0, "max": 1000000, "unit": "W"},
+    "Temperature": {"type": "float", "min": -60, "max": 150, "unit": "C"},
+}
+
+
+# Coerce a JSON value to int, accepting integral floats and numeric strings
+def _to_int(value):
+    if isinstance(value, bool):
+        raise ValueError("expected an integer")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        return int(value.strip())
+    raise ValueError("expected an integer")
+
+
+# Coerce a JSON value to a finite float, accepting ints and numeric strings
+def _to_float(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError("expected a number")
+    value = float(value.strip() if isinstance(value, str) else value)
+    if not math.isfinite(value):
+        raise ValueError("expected a finite number")
+    return value
+
+
+_COERCERS = {
+    "int": _to_int,
+    "float": _to_float,
+}
+
+
+# Build a validator for one field: returns the coerced value or raises ValueError
+def _compile_field(name, field):
+    coerce = _COERCERS[field["type"]]
+    low = field.get("min")
+    high = field.get("max")
+    unit = f" {field['unit']}" if "unit" in field else ""
+
+    def validate(value):
+        try:
+            value = coerce(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be of type {field['type']}")
+        if low is not None and value < low:
+            raise ValueError(f"{name} must be >= {low}{unit}")
+        if high is not None and value > high:
+            raise ValueError(f"{name} must be <= {high}{unit}")
+        return value
+
+    return validate
+
+
+# Compile a schema into a dict of field name -> validator
+def compile_schema(schema):
+    return {name: _compile_field(name, field) for name, field in schema.items()}
+
+
+LIGHTPOST_VALIDATORS = compile_schema(LIGHTPOST_SCHEMA)
+CORE_VALIDATORS = compile_schema(CORE_SCHEMA)
+
+
+# Apply a config payload to the act_value dict in place.
+# Returns (applied, rejected): the coerced fields that were stored and field -> reason for the rest.
+def apply_config(act_value, config_payload, validators):
+    if not isinstance(config_payload, dict):
+        return {}, {"payload": "expected a JSON object"}
+
+    applied = {}
+    rejected = {}
+    for name, value in config_payload.items():
+        validate = validators.get(name)
+        if validate is None:
+            rejected[name] = "unknown field"
+            continue
+        try:
+            applied[name] = validate(value)
+        except ValueError as e:
+            rejected[name] = str(e)
+
+    act_value.update(applied)
+    return applied, rejected
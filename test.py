@@ -1,8 +1,15 @@
 import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+import argparse
 import json
 import time
 import threading
-import os  # For clearing the screen
+
+from console import clear_screen
+from jsoncreate import load_tag_spec, iter_tags, count_tags, tag_at
+from schema import apply_config, LIGHTPOST_VALIDATORS, CORE_VALIDATORS
+from records import DeviceRecord, load_records, dump_records
 
 # Define the MQTT broker details
 broker = 'localhost'
@@ -14,9 +21,9 @@ timed_publishing = False
 publish_interval = 60  # Default interval (in seconds) for timed publishing
 
 # Load the payload data from the file (pisat.json for act_value and d2meshdata.json for act_value)
+# Lightpost act_value data is kept in memory as compact DeviceRecords and written back on config changes
 try:
-    with open("pisat.json", "r") as file:
-        act_value_payload = json.load(file)
+    lightposts = load_records("pisat.json")
 
     with open("d2meshdata.json", "r") as file:
         initial_payload = json.load(file)
@@ -24,12 +31,11 @@ except FileNotFoundError as e:
     print(f"Error: Could not find the required JSON files: {e}")
     exit(1)
 
-# Load tags from the generated_topics.txt file
+# Load the tag ranges from tags.json, tags themselves are generated lazily
 try:
-    with open("generated_topics.txt", "r") as file:
-        tags = [line.strip() for line in file.readlines() if line.strip()]
-except FileNotFoundError as e:
-    print(f"Error: Could not find 'generated_topics.txt' file: {e}")
+    tag_spec = load_tag_spec()
+except (json.JSONDecodeError, FileNotFoundError) as e:
+    print(f"Error loading tags.json file: {e}")
     exit(1)
 
 # Load the JSON payloads from the file
@@ -42,7 +48,7 @@ except (json.JSONDecodeError, FileNotFoundError) as e:
     exit(1)
 
 # Callback when the client receives a CONNACK response from the server
-def on_connect(client, userdata, flags, rc):
+def on_connect(client, userdata, flags, rc, properties=None):
     if rc == 0:
         print("Successfully connected to the broker.")
 
@@ -52,7 +58,7 @@ def on_connect(client, userdata, flags, rc):
         client.subscribe("d2mesh/gate2DB48EC0/request")
 
         # Subscribe to non-core (lightpost) topics for each tag
-        for tag in tags:
+        for tag in iter_tags(tag_spec):
             config_topic = f"d2mesh/gate2DB48EC0/lightpost/{tag}/config"
             response_topic = f"d2mesh/gate2DB48EC0/lightpost/{tag}/response"
             request_topic = f"d2mesh/gate2DB48EC0/lightpost/{tag}/request"
@@ -83,98 +89,109 @@ def on_message(client, userdata, msg):
 
     def handle_request_message(request_payload, topic_base):
         try:
+            # Requests are either a list of variables, or {"request_id": ..., "variables": [...]}
+            # from rpc.py; the request_id is echoed back so the client can match the response
+            request_id = None
+            if isinstance(request_payload, dict) and "variables" in request_payload:
+                request_id = request_payload.get("request_id")
+                request_payload = request_payload["variables"]
+
+            # MQTT v5 requests carry the id in the CorrelationData property instead
+            properties = getattr(msg, "properties", None)
+            correlation_data = getattr(properties, "CorrelationData", None)
+
             # Determine if the topic is a core topic (e.g., "d2mesh/gate2DB48EC0")
             if "lightpost" in topic_base:
                 # Handling for non-core topics
                 tag = topic_base.split("/")[-1]  # Extract tag (e.g., D202E7DF0000)
-                with open("pisat.json", "r") as f:
-                    non_core_data = json.load(f)
-
-                act_value_data = non_core_data.get(tag, {})  # Get data for the specific tag
-
-                response_data = {}
-                for variable in request_payload:
-                    if variable in act_value_data:
-                        response_data[variable] = act_value_data[variable]
-                    else:
-                        print(f"Variable '{variable}' not found in data for tag '{tag}'.")
-
-                if response_data:
-                    client.publish(f"{topic_base}/response", json.dumps(response_data))
-                    print(f"Published matching data to {topic_base}/response: {json.dumps(response_data, indent=4)}")
-                else:
-                    print("No matching data found for the requested variables.")
+                act_value_data = lightposts.get(tag, {})  # Get data for the specific tag
+                where = f"data for tag '{tag}'"
             else:
                 # Load data from d2meshdata.json for core requests
                 with open("d2meshdata.json", "r") as f:
                     core_data = json.load(f)
                 act_value_data = core_data.get("act_value", {})  # Get act_value data
+                where = "core data"
 
-                # Prepare the response data based on the requested payload
-                response_data = {}
-                for variable in request_payload:
-                    if variable in act_value_data:
-                        response_data[variable] = act_value_data[variable]
-                    else:
-                        print(f"Variable '{variable}' not found in core data.")
-
-                if response_data:
-                    # Publish the response to the response topic
-                    client.publish(f"{topic_base}/response", json.dumps(response_data))
-                    print(f"Published matching data to {topic_base}/response: {json.dumps(response_data, indent=4)}")
+            # Prepare the response data based on the requested payload
+            response_data = {}
+            for variable in request_payload:
+                if variable in act_value_data:
+                    response_data[variable] = act_value_data[variable]
                 else:
-                    print("No matching data found for the requested variables.")
-
-
+                    print(f"Variable '{variable}' not found in {where}.")
+
+            # Correlated requests are always answered, so the client can tell a miss from a lost response
+            if request_id is not None:
+                response_data["request_id"] = request_id
+
+            if response_data or correlation_data is not None:
+                response_properties = None
+                if correlation_data is not None:
+                    response_properties = Properties(PacketTypes.PUBLISH)
+                    response_properties.CorrelationData = correlation_data
+                response_topic = getattr(properties, "ResponseTopic", None) or f"{topic_base}/response"
+
+                # Publish the response to the response topic
+                client.publish(response_topic, json.dumps(response_data), properties=response_properties)
+                print(f"Published matching data to {response_topic}: {json.dumps(response_data, indent=4)}")
+            else:
+                print("No matching data found for the requested variables.")
 
         except json.JSONDecodeError:
             print("Error decoding the request payload.")
         except FileNotFoundError:
             print("Error: JSON file not found.")
 
-    # Check if the topic is for a request and handle accordingly
-    if "request" in msg.topic:
-        request_payload = json.loads(msg.payload.decode())
-        handle_request_message(request_payload, msg.topic)
-
     # Function to handle config messages
     def handle_config_message(config_payload, topic_base):
         try:
+            # Determine if it's core or non-core, and update the respective "act_value"
+            # Only fields that pass the device schema are stored, the rest are reported back
             if "lightpost" in topic_base:  # Non-core (lightpost) topics update pisat.json
                 file_path = "pisat.json"
+                tag = msg.topic.split("/")[3]
+                act_value = lightposts.get(tag)
+                if act_value is None:
+                    # New tags only get a record once a field is actually applied
+                    act_value = DeviceRecord()
+                applied, rejected = apply_config(act_value, config_payload, LIGHTPOST_VALIDATORS)
+
+                if applied:
+                    lightposts[tag] = act_value
+                    # Save all lightposts back to the file
+                    dump_records(lightposts, file_path)
+                encoded = act_value.encode()
             else:  # Core topics update d2meshdata.json
                 file_path = "d2meshdata.json"
+                with open(file_path, "r") as f:
+                    data = json.load(f)
 
-            # Load current data from the appropriate file
-            with open(file_path, "r") as f:
-                data = json.load(f)
-
-            # Determine if it's core or non-core, and update the respective "act_value"
-            if "lightpost" in topic_base:  # Non-core topics in pisat.json
-                tag = msg.topic.split("/")[3]
-                act_value = data.get(tag, {})
-                act_value.update(config_payload)  # Update specific fields
-                data[tag] = act_value
-            else:  # Core topics in d2meshdata.json
                 act_value = data.get("act_value", {})
-                act_value.update(config_payload)  # Update specific fields
+                applied, rejected = apply_config(act_value, config_payload, CORE_VALIDATORS)
                 data["act_value"] = act_value
 
-            # Save the updated data back to the respective file
-            with open(file_path, "w") as f:
-                json.dump(data, f, indent=4)
+                if applied:
+                    # Save the updated data back to the file
+                    with open(file_path, "w") as f:
+                        json.dump(data, f, indent=4)
+                encoded = json.dumps(act_value)
 
-            # Print the updated data
-            print(f"Updated data in {file_path}: {json.dumps(data, indent=4)}")
+            if applied:
+                print(f"Updated data in {file_path}: {act_value}")
 
-            # Publish the updated act_value data
-            act_value_topic = f"{topic_base}/act_value"
-            client.publish(act_value_topic, json.dumps(act_value))
-            print(f"Published updated data to {act_value_topic}")
+                # Publish the updated act_value data
+                act_value_topic = f"{topic_base}/act_value"
+                client.publish(act_value_topic, encoded)
+                print(f"Published updated data to {act_value_topic}")
 
-            # Publish the config message to the response topic
-            client.publish(f"{topic_base}/response", json.dumps(config_payload))
-            print(f"Copied config message to {topic_base}/response and updated act_value")
+            # Publish the applied fields, plus the rejected ones with a reason, to the response topic
+            response = dict(applied)
+            if rejected:
+                response["rejected"] = rejected
+                print(f"Rejected config fields for {topic_base}: {rejected}")
+            client.publish(f"{topic_base}/response", json.dumps(response))
+            print(f"Published config result to {topic_base}/response")
 
         except (FileNotFoundError, json.JSONDecodeError) as e:
             print(f"Error: {e}")
@@ -236,13 +253,13 @@ def publish_to_config(client, core=True):
         config_topic = "d2mesh/gate2DB48EC0/config"
     else:
         print("\nAvailable tags:")
-        for index, tag in enumerate(tags, 1):
+        for index, tag in enumerate(iter_tags(tag_spec), 1):
             print(f"{index}. {tag}")
         tag_choice = input("Enter the number of the tag you want to publish to: ")
         try:
             tag_index = int(tag_choice) - 1
-            if 0 <= tag_index < len(tags):
-                config_topic = f"d2mesh/gate2DB48EC0/lightpost/{tags[tag_index]}/config"
+            if 0 <= tag_index < count_tags(tag_spec):
+                config_topic = f"d2mesh/gate2DB48EC0/lightpost/{tag_at(tag_spec, tag_index)}/config"
             else:
                 print("Invalid tag choice.")
                 return
@@ -264,13 +281,13 @@ def publish_to_request(client, core=True):
         request_topic = "d2mesh/gate2DB48EC0/request"
     else:
         print("\nAvailable tags:")
-        for index, tag in enumerate(tags, 1):
+        for index, tag in enumerate(iter_tags(tag_spec), 1):
             print(f"{index}. {tag}")
         tag_choice = input("Enter the number of the tag you want to publish to: ")
         try:
             tag_index = int(tag_choice) - 1
-            if 0 <= tag_index < len(tags):
-                request_topic = f"d2mesh/gate2DB48EC0/lightpost/{tags[tag_index]}/request"
+            if 0 <= tag_index < count_tags(tag_spec):
+                request_topic = f"d2mesh/gate2DB48EC0/lightpost/{tag_at(tag_spec, tag_index)}/request"
             else:
                 print("Invalid tag choice.")
                 return
@@ -286,10 +303,6 @@ def publish_to_request(client, core=True):
     except json.JSONDecodeError:
         print("Invalid JSON format. Please try again.")
 
-# Function to clear the screen
-def clear_screen():
-    os.system('cls' if os.name == 'nt' else 'clear')
-
 # Function to show options menu
 def show_options_menu():
     print("\nOptions Menu:")
@@ -300,13 +313,21 @@ def show_options_menu():
     print("5. Exit")
 
 def main():
-    client = mqtt.Client()
+    parser = argparse.ArgumentParser(description="Simulated gateway answering core and lightpost topics.")
+    parser.add_argument("--broker", default=broker, help="broker host")
+    parser.add_argument("--port", type=int, default=port, help="broker port")
+    parser.add_argument("--serve", action="store_true", help="only answer config and request messages, without the menu")
+    parser.add_argument("--duration", type=float, default=0, help="stop serving after N seconds (0 = until interrupted)")
+    args = parser.parse_args()
+
+    # MQTT v5 so that CorrelationData and ResponseTopic on requests reach handle_request_message
+    client = mqtt.Client(protocol=mqtt.MQTTv5)
     client.on_connect = on_connect
     client.on_message = on_message
 
     # Connect to the MQTT broker
     try:
-        client.connect(broker, port)
+        client.connect(args.broker, args.port)
         print("Connected to the broker.")
     except Exception as e:
         print(f"Could not connect to broker: {e}")
@@ -316,12 +337,20 @@ def main():
     client.loop_start()
     print("Started MQTT loop in background.")
 
-    # Start the manual publishing function in the main thread
-    manual_publish(client)
-
-    # Stop the loop when exiting
-    client.loop_stop()
-    print("MQTT loop stopped.")
+    try:
+        if args.serve:
+            # Serve-only mode never reads stdin, so the gateway keeps answering when run unattended
+            deadline = time.monotonic() + args.duration if args.duration else None
+            while deadline is None or time.monotonic() < deadline:
+                time.sleep(0.5)
+        else:
+            # Start the manual publishing function in the main thread
+            manual_publish(client)
+    finally:
+        # Stop the loop when exiting
+        client.loop_stop()
+        client.disconnect()
+        print("MQTT loop stopped.")
 
 if __name__ == "__main__":
     try:
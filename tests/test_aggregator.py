@@ -0,0 +1,81 @@
+import pytest
+
+from aggregator import Pane, WindowAggregator, merge_panes, parse_window
+
+
+def test_pane_keeps_previous_fields_for_partial_messages():
+    pane = Pane()
+    pane.add("A", {"ActPower": 10, "DeviceMode": 1, "Voltage": 230})
+    pane.add("A", {"ActPower": 3})
+    pane.add("B", {"ActPower": 5, "DeviceMode": 2, "Voltage": 210})
+    pane.add("B", {"DeviceMode": 1})
+
+    assert pane.devices == {"A": (3, 1), "B": (5, 1)}
+    assert pane.act_power == 8
+    assert pane.modes == {1: 2}
+    assert (pane.voltage_min, pane.voltage_max) == (210, 230)
+    assert pane.messages == 4
+
+
+def test_merge_panes_merges_field_by_field():
+    older = Pane()
+    older.add("A", {"ActPower": 10, "DeviceMode": 1})
+    newer = Pane()
+    newer.add("A", {"ActPower": 3})
+
+    devices, act_power, modes, _, _, messages = merge_panes([older, newer])
+    assert devices == 1
+    assert act_power == 3
+    assert modes == {1: 1}
+    assert messages == 2
+
+
+def test_sliding_window_keeps_mode_from_older_pane():
+    window = WindowAggregator(180, 60)
+    window.add("gw", "A", {"ActPower": 10, "DeviceMode": 1}, 5)
+    window.add("gw", "A", {"ActPower": 3}, 65)
+
+    assert window.close(1)["gw"]["DeviceMode"] == {"1": 1}
+    summary = window.close(2)["gw"]
+    assert summary["DeviceMode"] == {"1": 1}
+    assert summary["ActPower"] == {"total": 3}
+
+
+def test_sliding_window_close_drops_expired_panes():
+    window = WindowAggregator(30, 10)
+    window.add("gw", "A", {"ActPower": 100, "Voltage": 230, "DeviceMode": 1}, 5)
+    window.add("gw", "B", {"ActPower": 70, "DeviceMode": 1}, 15)
+    window.add("gw", "C", {"ActPower": 10, "Voltage": 100, "DeviceMode": 3}, 25)
+
+    summary = window.close(3)["gw"]
+    assert (summary["window_start"], summary["window_end"]) == (0, 30)
+    assert summary["devices"] == 3
+    assert summary["ActPower"] == {"total": 180}
+    assert summary["Voltage"] == {"min": 100, "max": 230}
+
+    # The pane holding A has left the window
+    summary = window.close(4)["gw"]
+    assert summary["devices"] == 2
+    assert summary["ActPower"] == {"total": 80}
+
+    window.close(5)
+    assert window.close(6) == {}
+    assert window.panes == {}
+
+
+def test_tumbling_window_only_reports_its_own_pane():
+    window = WindowAggregator(10)
+    window.add("gw", "A", {"ActPower": 100}, 5)
+    window.add("gw", "A", {"ActPower": 50}, 15)
+
+    assert window.label == "10s"
+    assert window.close(1)["gw"]["ActPower"] == {"total": 100}
+    assert window.close(2)["gw"]["ActPower"] == {"total": 50}
+
+
+def test_fractional_window_and_slide():
+    assert WindowAggregator(0.3, 0.1).pane_count == 3
+    assert WindowAggregator(0.6, 0.2).pane_count == 3
+    assert parse_window("0.3:0.1").label == "0.3s_0.1s"
+    with pytest.raises(ValueError):
+        WindowAggregator(0.25, 0.1)
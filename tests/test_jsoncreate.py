@@ -0,0 +1,43 @@
+import pytest
+
+from jsoncreate import count_tags, iter_tags, parse_descriptor, tag_at
+
+
+def test_original_single_range_format():
+    spec = {"base_tag": "D202E7DF", "start": "0000", "end": "0FFF"}
+
+    tags = list(iter_tags(spec))
+    assert len(tags) == count_tags(spec) == 4096
+    assert tags[0] == "D202E7DF0000"
+    assert tags[-1] == "D202E7DF0FFF"
+
+
+def test_multiple_bases_ranges_and_descriptors():
+    spec = {"ranges": [{"base_tag": ["AA", "BB"], "start": "00", "end": "01"}, "CC:0010-0011,00FF"]}
+
+    assert list(iter_tags(spec)) == ["AA00", "AA01", "BB00", "BB01", "CC0010", "CC0011", "CC00FF"]
+    assert count_tags(spec) == 7
+
+
+def test_tag_at_matches_iteration():
+    spec = ["AA:00-02", {"base_tag": "BB", "start": "10", "end": "11"}]
+
+    assert [tag_at(spec, index) for index in range(count_tags(spec))] == list(iter_tags(spec))
+    with pytest.raises(IndexError):
+        tag_at(spec, count_tags(spec))
+    with pytest.raises(IndexError):
+        tag_at(spec, -1)
+
+
+def test_parse_descriptor():
+    assert list(parse_descriptor("D202E7DF:0000-00FF,0010")) == [
+        ("D202E7DF", 0x0000, 0x00FF, 4),
+        ("D202E7DF", 0x0010, 0x0010, 4),
+    ]
+    with pytest.raises(ValueError):
+        list(parse_descriptor("D202E7DF0000"))
+
+
+def test_empty_range_counts_nothing():
+    assert count_tags("AA:10-0F") == 0
+    assert list(iter_tags("AA:10-0F")) == []
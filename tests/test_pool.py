@@ -0,0 +1,112 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("paho.mqtt.client")
+
+from jsoncreate import iter_tags
+from pool import ClientPool, key_for_topic
+
+TAGS = {"base_tag": "D202E7DF", "start": "0000", "end": "0FFF"}
+
+
+class StubClient:
+    """Records calls instead of talking to a broker."""
+
+    def __init__(self):
+        self.subscribes = []
+        self.published = []
+
+    def subscribe(self, topics):
+        self.subscribes.append(topics)
+
+    def publish(self, topic, payload=None, qos=0, retain=False, properties=None):
+        self.published.append((topic, payload))
+
+
+def stub_pool(size, **kwargs):
+    pool = ClientPool(size, "localhost", 1883, **kwargs)
+    pool.clients = [StubClient() for _ in range(size)]
+    return pool
+
+
+def topics_per_connection(pool, count):
+    topics = [[] for _ in pool.clients]
+    for tag in iter_tags({"base_tag": "D202E7DF", "start": "0000", "end": f"{count - 1:04X}"}):
+        topic = f"d2mesh/gw/lightpost/{tag}/response"
+        topics[pool.index_for(tag)].append((topic, 0))
+    return topics
+
+
+def test_key_for_topic_uses_the_lightpost_tag():
+    assert key_for_topic("d2mesh/gate2DB48EC0/lightpost/D202E7DF0001/act_value") == "D202E7DF0001"
+    assert key_for_topic("d2mesh/gate2DB48EC0/config") == "d2mesh/gate2DB48EC0/config"
+
+
+def test_tags_are_spread_over_all_connections():
+    pool = ClientPool(4, "localhost", 1883)
+    counts = [0] * 4
+    for tag in iter_tags(TAGS):
+        counts[pool.index_for(tag)] += 1
+
+    assert all(count > 4096 / 4 * 0.7 for count in counts)
+
+
+def test_growing_the_pool_moves_few_tags():
+    before = ClientPool(4, "localhost", 1883)
+    after = ClientPool(5, "localhost", 1883)
+
+    moved = sum(before.index_for(tag) != after.index_for(tag) for tag in iter_tags(TAGS))
+    assert moved < 4096 * 0.35
+
+
+def test_subscribe_sends_one_batch_per_connection():
+    pool = stub_pool(3)
+    for index in range(3):
+        pool._on_connect(pool.clients[index], index, {}, 0)
+    expected = topics_per_connection(pool, 64)
+
+    pool.subscribe([topic for topics in expected for topic in topics])
+    for client, topics in zip(pool.clients, expected):
+        assert client.subscribes == [topics]
+    assert [stats["subscriptions"] for stats in pool.stats] == [len(topics) for topics in expected]
+
+
+def test_subscriptions_wait_for_connack_and_return_after_reconnect():
+    pool = stub_pool(2)
+    expected = topics_per_connection(pool, 16)
+    pool.subscribe([topic for topics in expected for topic in topics])
+    assert all(client.subscribes == [] for client in pool.clients)
+
+    for index, client in enumerate(pool.clients):
+        pool._on_connect(client, index, {}, 0)
+        assert client.subscribes == [expected[index]]
+    assert [stats["reconnects"] for stats in pool.stats] == [0, 0]
+
+    # A failed CONNACK changes nothing, a successful reconnect restores the subscriptions
+    pool._on_connect(pool.clients[0], 0, {}, 5)
+    pool._on_connect(pool.clients[0], 0, {}, 0)
+    assert pool.clients[0].subscribes == [expected[0], expected[0]]
+    assert [stats["reconnects"] for stats in pool.stats] == [1, 0]
+
+
+def test_message_callbacks_take_precedence_over_on_message():
+    seen = []
+    pool = stub_pool(1, on_message=lambda client, index, msg: seen.append(("on_message", msg.topic)))
+    pool.message_callback_add("d2mesh/+/lightpost/+/response", lambda client, index, msg: seen.append(("response", msg.topic)))
+
+    pool._on_message(pool.clients[0], 0, SimpleNamespace(topic="d2mesh/gw/lightpost/A/response"))
+    pool._on_message(pool.clients[0], 0, SimpleNamespace(topic="d2mesh/gw/lightpost/A/act_value"))
+    assert seen == [("response", "d2mesh/gw/lightpost/A/response"), ("on_message", "d2mesh/gw/lightpost/A/act_value")]
+    assert pool.stats[0]["received"] == 2
+
+
+def test_published_bytes_count_encoded_payloads():
+    pool = stub_pool(1)
+    pool.publish("d2mesh/gw/lightpost/A/config", "Напон")
+    pool.publish("d2mesh/gw/lightpost/A/config", b"abc")
+    pool.publish("d2mesh/gw/lightpost/A/config", 42)
+    pool.publish("d2mesh/gw/lightpost/A/config")
+
+    assert pool.stats[0]["published"] == 4
+    assert pool.stats[0]["bytes"] == len("Напон".encode()) + 3 + 2
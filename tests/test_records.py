@@ -0,0 +1,43 @@
+import json
+
+from records import DeviceRecord, dump_records, load_records, measure
+
+
+def test_record_behaves_like_act_value_dict():
+    record = DeviceRecord({"Voltage": 3, "Unknown": 1})
+
+    assert "Voltage" in record and "Unknown" in record
+    assert "Latitude" not in record
+    assert record["Unknown"] == 1
+    assert record.get("Latitude") is None
+    assert record.to_dict() == {"Voltage": 3, "Unknown": 1}
+
+
+def test_encode_follows_updates_without_keeping_bytes():
+    record = DeviceRecord({"Voltage": 3})
+
+    assert json.loads(record.encode()) == {"Voltage": 3}
+    record.update({"Voltage": 4})
+    assert json.loads(record.encode()) == {"Voltage": 4}
+    assert not hasattr(record, "__dict__")
+
+
+def test_publishing_does_not_grow_records():
+    count = 256
+    results = measure(count)
+
+    # Keeping the encoded bytes would add at least a payload per device; allow for unrelated
+    # allocations (other threads, interpreter caches) while measuring
+    growth = results["DeviceRecord after publish"] - results["DeviceRecord"]
+    assert growth < count * 16
+    assert results["DeviceRecord after publish"] < results["dict after publish"]
+
+
+def test_load_and_dump_round_trip(tmp_path):
+    path = tmp_path / "pisat.json"
+    data = {"D202E7DF0000": {"Timestamp": 2, "Voltage": 380}, "D202E7DF0002": {"Timestamp": 666666}}
+    path.write_text(json.dumps(data))
+
+    records = load_records(str(path))
+    dump_records(records, str(path))
+    assert json.loads(path.read_text()) == data
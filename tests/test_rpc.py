@@ -0,0 +1,152 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("paho.mqtt.client")
+
+from rpc import LatencyHistogram, RequestClient, RequestTimeout
+
+
+class FakeClient:
+    """Records what RequestClient sends instead of talking to a broker."""
+
+    def __init__(self):
+        self.published = []
+        self.subscribed = []
+        self.callbacks = {}
+
+    def publish(self, topic, payload=None, qos=0, retain=False, properties=None):
+        self.published.append((topic, payload, properties))
+
+    def subscribe(self, topic, qos=0):
+        self.subscribed.append(topic)
+
+    def message_callback_add(self, sub, callback):
+        self.callbacks[sub] = callback
+
+
+def response(payload, correlation_data=None):
+    properties = SimpleNamespace(CorrelationData=correlation_data) if correlation_data is not None else None
+    return SimpleNamespace(topic="d2mesh/gw/lightpost/A/response", payload=json.dumps(payload).encode(),
+                           properties=properties)
+
+
+def test_histogram_summary():
+    histogram = LatencyHistogram()
+    for latency in [0.1, 0.9, 1.5, 3, 3, 3, 3, 3, 3, 100]:
+        histogram.record(latency)
+
+    summary = histogram.summary()
+    assert summary["count"] == 10
+    assert (summary["min_ms"], summary["max_ms"]) == (0.1, 100)
+    assert summary["p50_ms"] == 4
+    # The 100 ms sample sits in the <=128 bucket, but nothing slower than 100 ms was seen
+    assert summary["p99_ms"] == 100
+    assert sum(summary["buckets"].values()) == 10
+
+
+def test_histogram_percentile_never_exceeds_max():
+    histogram = LatencyHistogram()
+    histogram.record(3)
+
+    assert histogram.percentile(50) == histogram.percentile(99) == 3
+
+
+def test_empty_histogram():
+    summary = LatencyHistogram().summary()
+    assert summary["count"] == 0
+    assert summary["p50_ms"] is None
+
+
+def test_response_matched_by_embedded_request_id():
+    client = FakeClient()
+    rpc = RequestClient(client, "gw")
+    future = rpc.request("A", ["Voltage"])
+
+    topic, payload, properties = client.published[0]
+    assert topic == "d2mesh/gw/lightpost/A/request"
+    assert properties is None
+    request = json.loads(payload)
+    assert request["variables"] == ["Voltage"]
+
+    rpc.on_response(client, None, response({"request_id": request["request_id"], "Voltage": 230}))
+    assert future.result(timeout=0) == {"Voltage": 230}
+    report = rpc.report()
+    assert (report["completed"], report["unmatched"], report["in_flight"]) == (1, 0, 0)
+    assert report["latency"]["count"] == 1
+
+
+def test_response_matched_by_correlation_data():
+    client = FakeClient()
+    rpc = RequestClient(client, "gw", use_v5=True)
+    future = rpc.request("A", ["Voltage"])
+
+    _, payload, properties = client.published[0]
+    assert json.loads(payload) == ["Voltage"]
+    assert properties.ResponseTopic == "d2mesh/gw/lightpost/A/response"
+
+    rpc.on_response(client, None, response({"Voltage": 230}, properties.CorrelationData))
+    assert future.result(timeout=0) == {"Voltage": 230}
+    assert rpc.report()["completed"] == 1
+
+
+def test_unmatched_and_late_responses_are_counted():
+    client = FakeClient()
+    rpc = RequestClient(client, "gw")
+    future = rpc.request("A", ["Voltage"])
+    request_id = json.loads(client.published[0][1])["request_id"]
+
+    rpc.on_response(client, None, response({"Voltage": 230}))
+    rpc.on_response(client, None, response({"request_id": "someone-else", "Voltage": 230}))
+    assert not future.done()
+
+    rpc.on_response(client, None, response({"request_id": request_id, "Voltage": 230}))
+    rpc.on_response(client, None, response({"request_id": request_id, "Voltage": 231}))
+    assert future.result(timeout=0) == {"Voltage": 230}
+    assert (rpc.report()["completed"], rpc.report()["unmatched"]) == (1, 3)
+
+
+def test_sweep_fails_overdue_requests():
+    client = FakeClient()
+    rpc = RequestClient(client, "gw", timeout=60)
+    rpc.start(tags=[])
+    try:
+        # An explicit zero timeout is honoured, not replaced by the default
+        overdue = rpc.request("A", ["Voltage"], timeout=0)
+        waiting = rpc.request("B", ["Voltage"])
+        with pytest.raises(RequestTimeout):
+            overdue.result(timeout=1)
+    finally:
+        rpc.stop()
+
+    assert client.subscribed == []
+    assert "d2mesh/gw/lightpost/+/response" in client.callbacks
+    assert not waiting.done()
+    report = rpc.report()
+    assert (report["timed_out"], report["in_flight"]) == (1, 1)
+
+    # The answer to the timed-out request arrives after all
+    request_id = json.loads(client.published[0][1])["request_id"]
+    rpc.on_response(client, None, response({"request_id": request_id}))
+    assert rpc.report()["unmatched"] == 1
+
+
+def test_reset_keeps_requests_in_flight():
+    client = FakeClient()
+    rpc = RequestClient(client, "gw")
+    first = rpc.request("A", ["Voltage"])
+    second = rpc.request("B", ["Voltage"])
+    rpc.on_response(client, None, response({"request_id": json.loads(client.published[0][1])["request_id"]}))
+
+    report = rpc.reset()
+    assert (report["sent"], report["completed"], report["in_flight"]) == (2, 1, 1)
+    assert report["latency"]["count"] == 1
+
+    report = rpc.report()
+    assert (report["sent"], report["completed"], report["in_flight"]) == (0, 0, 1)
+    assert report["latency"]["count"] == 0
+
+    rpc.on_response(client, None, response({"request_id": json.loads(client.published[1][1])["request_id"]}))
+    assert first.done() and second.done()
+    assert rpc.report()["completed"] == 1
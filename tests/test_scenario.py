@@ -0,0 +1,129 @@
+import itertools
+import json
+import time
+
+import pytest
+
+pytest.importorskip("paho.mqtt.client")
+
+from rpc import RequestClient
+from scenario import DEFAULT_SCENARIO, ScenarioRunner, load_scenario
+
+
+class StubPool:
+    """Stands in for ClientPool; act_value publishes are echoed back like a broker would."""
+
+    def __init__(self, on_message):
+        self.on_message = on_message
+        self.clients = [None]
+        self.published = []
+        self.subscribed = []
+        self.disconnected = False
+
+    def connect(self, keepalive=60, timeout=10):
+        pass
+
+    def publish(self, topic, payload=None, qos=0, retain=False, properties=None, key=None):
+        self.published.append((topic, payload))
+        if topic.endswith("/act_value"):
+            self.on_message(None, 0, type("Message", (), {"topic": topic, "payload": payload}))
+
+    def subscribe(self, topic, qos=0, key=None):
+        self.subscribed.append(topic)
+
+    def message_callback_add(self, sub, callback):
+        pass
+
+    def disconnect(self):
+        self.disconnected = True
+
+    def report(self):
+        return {"published": len(self.published)}
+
+
+def make_runner(phases, tags=("AA:00-03",)):
+    runner = ScenarioRunner({**DEFAULT_SCENARIO, "tags": list(tags), "act_values": "missing.json", "phases": phases})
+    runner.pool = StubPool(runner.on_message)
+    runner.rpc = RequestClient(runner.pool, runner.gateway)
+    return runner
+
+
+def test_load_json_scenario_fills_defaults(tmp_path):
+    path = tmp_path / "scenario.json"
+    path.write_text(json.dumps({"broker": "mqtt.local", "phases": [{"type": "sleep"}]}))
+
+    scenario = load_scenario(str(path))
+    assert scenario["broker"] == "mqtt.local"
+    assert scenario["phases"] == [{"type": "sleep"}]
+    assert scenario["port"] == DEFAULT_SCENARIO["port"]
+    assert scenario["connections"] == DEFAULT_SCENARIO["connections"]
+
+
+def test_load_yaml_scenario_fills_defaults(tmp_path):
+    pytest.importorskip("yaml")
+    path = tmp_path / "scenario.yaml"
+    path.write_text("port: 1884\nphases:\n  - type: connect\n    devices: 2\n")
+
+    scenario = load_scenario(str(path))
+    assert scenario["port"] == 1884
+    assert scenario["phases"] == [{"type": "connect", "devices": 2}]
+    assert scenario["gateway"] == DEFAULT_SCENARIO["gateway"]
+
+
+def test_load_scenario_rejects_files_without_a_mapping(tmp_path):
+    pytest.importorskip("yaml")
+    empty = tmp_path / "empty.yaml"
+    empty.write_text("")
+    listed = tmp_path / "listed.json"
+    listed.write_text("[]")
+
+    with pytest.raises(ValueError):
+        load_scenario(str(empty))
+    with pytest.raises(ValueError):
+        load_scenario(str(listed))
+
+
+def test_unknown_phase_type_stops_the_run():
+    runner = make_runner([{"type": "connect"}, {"type": "explode"}])
+
+    with pytest.raises(ValueError, match="explode"):
+        runner.run()
+    assert runner.pool.disconnected
+
+
+def test_paced_publish_with_no_devices_ends():
+    runner = make_runner([])
+    messages = ((tag, b"{}") for tag in runner.cycle_tags(0))
+
+    assert runner.paced_publish(messages, 0, time.monotonic() + 5) == 0
+    assert runner.run_publish({"devices": 0, "duration": 5})["sent"] == 0
+
+
+def test_paced_publish_stops_at_deadline():
+    runner = make_runner([])
+    start = time.monotonic()
+
+    sent = runner.paced_publish(itertools.repeat(("topic", b"{}")), 1000, start + 0.05)
+    assert 0 < sent <= 60
+    assert time.monotonic() - start < 1
+    assert runner.paced_publish(itertools.repeat(("topic", b"{}")), 0, start) == 0
+
+
+def test_run_report_totals():
+    runner = make_runner([
+        {"type": "connect", "devices": 2},
+        {"type": "publish", "rate": 0, "duration": 0.02},
+        {"type": "config_burst", "payloads": [{"Voltage": 1}, {"DeviceMode": 2}]},
+        {"type": "sleep", "duration": 0},
+    ])
+
+    report = runner.run()
+    publish, burst = report["phases"][1], report["phases"][2]
+    assert [phase["type"] for phase in report["phases"]] == ["connect", "publish", "config_burst", "sleep"]
+    assert report["phases"][0]["devices"] == 2
+    assert burst["sent"] == 4
+    assert report["sent"] == publish["sent"] + burst["sent"]
+    assert report["received"] == {"act_value": publish["sent"], "other": 0}
+    assert report["connections"] == {"published": report["sent"]}
+    assert report["elapsed"] == pytest.approx(sum(phase["elapsed"] for phase in report["phases"]), abs=0.002)
+    assert runner.pool.disconnected
@@ -0,0 +1,38 @@
+import json
+import os
+
+from schema import CORE_VALIDATORS, LIGHTPOST_VALIDATORS, apply_config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_apply_config_coerces_and_rejects():
+    act_value = {"Voltage": 1}
+    applied, rejected = apply_config(
+        act_value,
+        {"config": 1, "Longitude": "12.5", "Latitude": 200, "Voltage": True, "LightPower": 50.0},
+        LIGHTPOST_VALIDATORS,
+    )
+
+    assert applied == {"Longitude": 12.5, "LightPower": 50}
+    assert set(rejected) == {"config", "Latitude", "Voltage"}
+    assert rejected["config"] == "unknown field"
+    assert act_value == {"Voltage": 1, "Longitude": 12.5, "LightPower": 50}
+
+
+def test_apply_config_rejects_non_objects_and_non_finite_numbers():
+    assert apply_config({}, [1], CORE_VALIDATORS) == ({}, {"payload": "expected a JSON object"})
+
+    applied, rejected = apply_config({}, {"Temperature": "nan"}, CORE_VALIDATORS)
+    assert applied == {}
+    assert "Temperature" in rejected
+
+
+def test_repo_fixtures_match_the_lightpost_schema():
+    with open(os.path.join(ROOT, "pisat.json")) as f:
+        records = json.load(f)
+    with open(os.path.join(ROOT, "badpisat.json")) as f:
+        payloads = json.load(f)["payloads"]
+
+    for values in list(records.values()) + payloads:
+        assert apply_config({}, values, LIGHTPOST_VALIDATORS)[1] == {}